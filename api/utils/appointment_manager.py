@@ -1,23 +1,44 @@
 import logging
 from datetime import datetime, timedelta
-from google_calendar_manager import GoogleCalendarScheduler
 
 logger = logging.getLogger(__name__)
 
 class AppointmentManager:
-    def __init__(self, client_secret_path):
-        self.calendar_scheduler = GoogleCalendarScheduler(client_secret_path)
+    def __init__(self, booking_queue):
+        self.booking_queue = booking_queue
 
-    async def reschedule_appointment(self, current_appointment, new_date_time):
+    async def book_appointment(self, booking_id, patient_info, preferred_date_time):
+        try:
+            logger.info(f"Attempting to book appointment {booking_id} for {preferred_date_time}")
+            details = {
+                "summary": f"Appointment with {patient_info.get('name', 'patient')}",
+                "description": f"Contact: {patient_info.get('contact', '')}\nReason: {patient_info.get('reason', '')}",
+                "name": patient_info.get('name', ''),
+                "contact": patient_info.get('contact', ''),
+            }
+            start_time, end_time = self.parse_datetime(preferred_date_time)
+            if not start_time or not end_time:
+                # Keep the request so staff can call back and agree a time.
+                self.booking_queue.record_unscheduled(booking_id, preferred_date_time, **details)
+                return None
+
+            self.booking_queue.enqueue_create(booking_id, start_time, end_time, **details)
+            return start_time
+        except Exception as e:
+            # Nothing was recorded, so the caller must not be promised a follow-up.
+            logger.error(f"Failed to queue appointment: {e}")
+            raise
+
+    async def reschedule_appointment(self, current_appointment, new_date_time, request_id=None):
         try:
             logger.info(f"Attempting to reschedule appointment: {current_appointment} to {new_date_time}")
             start_time, end_time = self.parse_datetime(new_date_time)
             if not start_time or not end_time:
                 return "Invalid date or time provided for rescheduling."
 
-            event_result = await self.calendar_scheduler.reschedule_event(current_appointment, start_time, end_time)
-            logger.info(f"Rescheduled event result: {event_result}")
-            return f"Your appointment has been successfully rescheduled to {datetime.fromisoformat(start_time).strftime('%A, %B %d, %Y at %I:%M %p')}."
+            self.booking_queue.enqueue_reschedule(current_appointment, start_time, end_time, request_id=request_id)
+            # The move is applied in the background and can still conflict.
+            return f"I've requested to move your appointment to {datetime.fromisoformat(start_time).strftime('%A, %B %d, %Y at %I:%M %p')}. If that time turns out to be unavailable, our staff will call you."
         except Exception as e:
             logger.error(f"Failed to reschedule appointment: {e}")
             return "Sorry, there was an issue rescheduling your appointment. Please try again later."
@@ -25,8 +46,8 @@ class AppointmentManager:
     async def cancel_appointment(self, appointment_to_cancel):
         try:
             logger.info(f"Attempting to cancel appointment: {appointment_to_cancel}")
-            await self.calendar_scheduler.cancel_event(appointment_to_cancel)
-            return "Your appointment has been successfully canceled."
+            self.booking_queue.enqueue_cancel(appointment_to_cancel)
+            return "I've requested the cancellation of your appointment. If there is any problem, our staff will call you."
         except Exception as e:
             logger.error(f"Failed to cancel appointment: {e}")
             return "Sorry, there was an issue canceling your appointment. Please try again later."
@@ -63,6 +84,12 @@ class AppointmentManager:
             for fmt in formats:
                 try:
                     start_time = datetime.strptime(datetime_str, fmt)
+                    if "%Y" not in fmt:
+                        # No year spoken: take the next occurrence of that date.
+                        today = datetime.now().date()
+                        start_time = start_time.replace(year=today.year)
+                        if start_time.date() < today:
+                            start_time = start_time.replace(year=start_time.year + 1)
                     end_time = start_time + timedelta(hours=1)
                     return start_time.isoformat(), end_time.isoformat()
                 except ValueError:
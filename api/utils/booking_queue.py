@@ -0,0 +1,487 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+CONFLICT = "conflict"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+# A booking whose requested time could not be understood; staff arrange it by phone.
+UNSCHEDULED = "unscheduled"
+
+CREATE = "create"
+RESCHEDULE = "reschedule"
+CANCEL = "cancel"
+
+# HTTP statuses worth retrying; any other 4xx is treated as permanent.
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# Google Calendar signals rate limiting with a 403 carrying one of these reasons.
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS booking_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    booking_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    event_id TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_booking_jobs_due ON booking_jobs (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_booking_jobs_booking ON booking_jobs (booking_id, status);
+"""
+
+
+def event_id_for(booking_id):
+    """Deterministic calendar event id, so a replayed create cannot double-book."""
+    # Google Calendar accepts base32hex ids (a-v, 0-9); a hex digest fits.
+    return hashlib.sha1(booking_id.encode("utf-8")).hexdigest()
+
+
+class BookingQueue:
+    """Durable write-behind queue for calendar writes, backed by SQLite.
+
+    The conversation enqueues a job and confirms straight away; ``run()``
+    drains due jobs in batches against the calendar, re-checking for
+    conflicts and retrying transient failures with backoff.
+
+    The calendar must provide ``list_events(time_min, time_max)`` and
+    ``execute_batch(operations)``, as ``GoogleCalendarScheduler`` does.
+    ``time_zone`` is the clinic's IANA zone; spoken times carry no offset and
+    are interpreted in it.
+
+    Jobs that end in CONFLICT, FAILED or UNSCHEDULED are passed to ``on_unresolved``
+    (called from the worker thread) and listed by ``needs_attention()`` so
+    staff can follow up with the patient.
+    """
+
+    def __init__(self, db_path, calendar, time_zone, batch_size=50, max_attempts=5,
+                 base_retry_delay=2.0, max_retry_delay=300.0, poll_interval=1.0,
+                 on_unresolved=None):
+        self.db_path = db_path
+        self.calendar = calendar
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_retry_delay = base_retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.poll_interval = poll_interval
+        self.time_zone = ZoneInfo(time_zone)
+        self.on_unresolved = on_unresolved
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Patients are told about a booking once it is queued, so every commit
+        # must survive a power loss; FULL costs little at this write rate.
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+        self._recover_in_flight()
+
+        self._wakeup = None
+        self._stopping = False
+        self._task = None
+
+    # Producer side
+
+    def enqueue_create(self, booking_id, start_time, end_time, summary, description="", name="", contact=""):
+        payload = {
+            "start_time": start_time,
+            "end_time": end_time,
+            "summary": summary,
+            "description": description,
+            "name": name,
+            "contact": contact,
+        }
+        return self.enqueue(CREATE, booking_id, payload, idempotency_key=f"{booking_id}:create")
+
+    def enqueue_reschedule(self, booking_id, start_time, end_time, request_id=None):
+        """Queue a move of the booking; reuse ``request_id`` when retrying the same request."""
+        payload = {"start_time": start_time, "end_time": end_time}
+        request_id = request_id or str(uuid.uuid4())
+        return self.enqueue(RESCHEDULE, booking_id, payload,
+                            idempotency_key=f"{booking_id}:reschedule:{request_id}")
+
+    def enqueue_cancel(self, booking_id):
+        return self.enqueue(CANCEL, booking_id, {}, idempotency_key=f"{booking_id}:cancel")
+
+    def record_unscheduled(self, booking_id, requested_time, summary, description="", name="", contact=""):
+        """Keep a booking whose time could not be parsed so staff can arrange it."""
+        payload = {
+            "requested_time": requested_time,
+            "summary": summary,
+            "description": description,
+            "name": name,
+            "contact": contact,
+        }
+        idempotency_key = f"{booking_id}:create"
+        error = f"Could not understand requested time: {requested_time}"
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO booking_jobs "
+                "(idempotency_key, booking_id, action, payload, status, next_attempt_at, last_error, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (idempotency_key, booking_id, CREATE, json.dumps(payload), UNSCHEDULED, now, error, now, now),
+            )
+        if cursor.rowcount:
+            logger.warning(f"Booking {booking_id} recorded without a time for staff follow-up")
+            self._notify_unresolved({
+                "idempotency_key": idempotency_key,
+                "booking_id": booking_id,
+                "action": CREATE,
+                "status": UNSCHEDULED,
+                "payload": payload,
+                "last_error": error,
+            })
+        return idempotency_key
+
+    def enqueue(self, action, booking_id, payload, idempotency_key=None):
+        """Persist a job and return its idempotency key; duplicates are ignored."""
+        if action not in (CREATE, RESCHEDULE, CANCEL):
+            raise ValueError(f"Unknown booking action: {action}")
+        if action in (CREATE, RESCHEDULE):
+            self._job_times(payload)
+        idempotency_key = idempotency_key or str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO booking_jobs "
+                    "(idempotency_key, booking_id, action, payload, status, next_attempt_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (idempotency_key, booking_id, action, json.dumps(payload), PENDING, now, now, now),
+                )
+                if cursor.rowcount and action == RESCHEDULE:
+                    # Only the latest target time matters; drop reschedules it replaces.
+                    self._conn.execute(
+                        "UPDATE booking_jobs SET status = ?, updated_at = ? "
+                        "WHERE booking_id = ? AND action = ? AND status = ? AND id < ?",
+                        (SUPERSEDED, now, booking_id, RESCHEDULE, PENDING, cursor.lastrowid),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if cursor.rowcount:
+            logger.info(f"Queued {action} for booking {booking_id} ({idempotency_key})")
+            if self._wakeup is not None:
+                self._wakeup.set()
+        else:
+            logger.info(f"Ignoring duplicate booking job {idempotency_key}")
+        return idempotency_key
+
+    def status(self, idempotency_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT idempotency_key, booking_id, action, status, attempts, next_attempt_at, event_id, "
+                "last_error FROM booking_jobs WHERE idempotency_key = ?",
+                (idempotency_key,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def needs_attention(self):
+        """Bookings whose jobs ended in CONFLICT, FAILED or UNSCHEDULED, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idempotency_key, booking_id, action, status, payload, last_error, updated_at "
+                "FROM booking_jobs WHERE status IN (?, ?, ?) ORDER BY updated_at",
+                (CONFLICT, FAILED, UNSCHEDULED),
+            ).fetchall()
+        return [dict(row, payload=json.loads(row["payload"])) for row in rows]
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM booking_jobs WHERE status IN (?, ?)", (PENDING, IN_PROGRESS)
+            ).fetchone()[0]
+
+    # Worker side
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        logger.info("Booking queue worker started")
+        while not self._stopping:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Booking queue worker error, retrying in {self.poll_interval}s: {e}")
+                processed = 0
+            if processed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Booking queue worker stopped")
+
+    async def drain_once(self):
+        """Claim and process one batch of due jobs; returns how many were processed."""
+        jobs = self._claim_due()
+        if not jobs:
+            return 0
+        try:
+            # Calendar clients block on HTTP, so keep them off the event loop.
+            await asyncio.to_thread(self._process_batch, jobs)
+        except Exception:
+            # Hand the claimed jobs back rather than leaving them in_progress
+            # until the next restart.
+            self._release(jobs)
+            raise
+        return len(jobs)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _recover_in_flight(self):
+        # Jobs claimed by a worker that died mid-batch go back on the queue;
+        # deterministic event ids make replaying them safe.
+        with self._lock:
+            self._conn.execute(
+                "UPDATE booking_jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), IN_PROGRESS),
+            )
+
+    def _release(self, jobs):
+        try:
+            with self._lock:
+                self._conn.executemany(
+                    "UPDATE booking_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    [(PENDING, time.time(), job["id"], IN_PROGRESS) for job in jobs],
+                )
+        except Exception as e:
+            logger.error(f"Failed to release {len(jobs)} booking jobs: {e}")
+
+    def _claim_due(self):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Only the oldest unfinished job of each booking is eligible, so a
+                # reschedule or cancel never overtakes its create.
+                rows = self._conn.execute(
+                    "SELECT * FROM booking_jobs j WHERE j.status = ? AND j.next_attempt_at <= ? "
+                    "AND NOT EXISTS (SELECT 1 FROM booking_jobs p WHERE p.booking_id = j.booking_id "
+                    "AND p.id < j.id AND p.status IN (?, ?)) "
+                    "ORDER BY j.id LIMIT ?",
+                    (PENDING, now, PENDING, IN_PROGRESS, self.batch_size),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE booking_jobs SET status = ?, updated_at = ? WHERE id = ?",
+                    [(IN_PROGRESS, now, row["id"]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [dict(row, payload=json.loads(row["payload"])) for row in rows]
+
+    def _process_batch(self, jobs):
+        outcomes = {}
+        job_times = {}
+        for job in jobs:
+            if job["action"] == CANCEL:
+                continue
+            try:
+                job_times[job["id"]] = self._job_times(job["payload"])
+            except ValueError as e:
+                # A malformed job fails on its own; it never blocks the rest of the batch.
+                outcomes[job["id"]] = (FAILED, None, str(e))
+        jobs_to_send = [job for job in jobs if job["id"] not in outcomes]
+
+        try:
+            busy = self._busy_intervals(job_times.values())
+        except Exception as e:
+            logger.error(f"Conflict check failed for batch of {len(jobs_to_send)} jobs: {e}")
+            for job in jobs_to_send:
+                outcomes[job["id"]] = (self._retry_or_fail(job, e), None, str(e))
+            self._record(outcomes, jobs)
+            return
+
+        operations = []
+        submitted = []
+        for job in jobs_to_send:
+            event_id = event_id_for(job["booking_id"])
+            payload = job["payload"]
+            if job["action"] == CANCEL:
+                operations.append(("delete", event_id, None))
+                submitted.append(job)
+                continue
+
+            start, end = job_times[job["id"]]
+            clash = next((other for other, s, e in busy if other != event_id and s < end and start < e), None)
+            if clash:
+                outcomes[job["id"]] = (CONFLICT, None, f"Slot overlaps event {clash}")
+                continue
+            # Later jobs in the same batch must see this slot as taken.
+            busy.append((event_id, start, end))
+
+            times = {"start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()}}
+            if job["action"] == CREATE:
+                body = dict(times, id=event_id, summary=payload.get("summary", ""),
+                            description=payload.get("description", ""))
+                operations.append(("insert", None, body))
+            else:
+                operations.append(("patch", event_id, times))
+            submitted.append(job)
+
+        results = []
+        if operations:
+            try:
+                results = self.calendar.execute_batch(operations)
+            except Exception as e:
+                logger.error(f"Calendar batch request failed: {e}")
+                results = [(None, e)] * len(operations)
+            if len(results) != len(operations):
+                logger.error(f"Calendar returned {len(results)} results for {len(operations)} operations")
+                missing = RuntimeError("No result returned for calendar operation")
+                results = list(results[:len(operations)]) + [(None, missing)] * (len(operations) - len(results))
+
+        for job, (response, error) in zip(submitted, results):
+            event_id = event_id_for(job["booking_id"])
+            if error is None:
+                outcomes[job["id"]] = (DONE, (response or {}).get("id", event_id), None)
+            elif self._already_applied(job, error):
+                outcomes[job["id"]] = (DONE, event_id, None)
+            else:
+                outcomes[job["id"]] = (self._retry_or_fail(job, error), None, str(error))
+        self._record(outcomes, jobs)
+
+    def _busy_intervals(self, intervals):
+        intervals = list(intervals)
+        if not intervals:
+            return []
+        # One list call covers the whole batch instead of one per job.
+        window_start = min(start for start, _ in intervals)
+        window_end = max(end for _, end in intervals)
+        busy = []
+        for event in self.calendar.list_events(window_start.isoformat(), window_end.isoformat()):
+            if event.get("status") == "cancelled":
+                continue
+            start = self._event_time(event.get("start", {}))
+            end = self._event_time(event.get("end", {}))
+            if start and end:
+                busy.append((event.get("id"), start, end))
+        return busy
+
+    def _already_applied(self, job, error):
+        status = getattr(error, "status", None)
+        # 409 on insert means our deterministic id already exists: an earlier
+        # attempt succeeded. 404/410 on delete means it is already gone.
+        if job["action"] == CREATE and status == 409:
+            return True
+        return job["action"] == CANCEL and status in (404, 410)
+
+    def _retry_or_fail(self, job, error):
+        status = getattr(error, "status", None)
+        rate_limited = status == 403 and getattr(error, "reason", None) in RATE_LIMIT_REASONS
+        if status is not None and status not in RETRYABLE_STATUSES and not rate_limited:
+            return FAILED
+        return FAILED if job["attempts"] + 1 >= self.max_attempts else PENDING
+
+    def _record(self, outcomes, jobs):
+        now = time.time()
+        attempts = {job["id"]: job["attempts"] + 1 for job in jobs}
+        rows = []
+        for job_id, (status, event_id, error) in outcomes.items():
+            delay = min(self.base_retry_delay * 2 ** (attempts[job_id] - 1), self.max_retry_delay)
+            next_attempt_at = now + delay if status == PENDING else now
+            rows.append((status, attempts[job_id], next_attempt_at, event_id, error, now, job_id))
+            if status == DONE:
+                logger.info(f"Booking job {job_id} done (event {event_id})")
+            elif status == PENDING:
+                logger.warning(f"Booking job {job_id} will retry in {delay:.0f}s: {error}")
+            else:
+                logger.error(f"Booking job {job_id} {status}: {error}")
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE booking_jobs SET status = ?, attempts = ?, next_attempt_at = ?, "
+                    "event_id = COALESCE(?, event_id), last_error = ?, updated_at = ? WHERE id = ?",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        jobs_by_id = {job["id"]: job for job in jobs}
+        for job_id, (status, _, error) in outcomes.items():
+            if status not in (CONFLICT, FAILED):
+                continue
+            job = jobs_by_id[job_id]
+            self._notify_unresolved({
+                "idempotency_key": job["idempotency_key"],
+                "booking_id": job["booking_id"],
+                "action": job["action"],
+                "status": status,
+                "payload": job["payload"],
+                "last_error": error,
+            })
+
+    def _notify_unresolved(self, job):
+        if self.on_unresolved is None:
+            return
+        try:
+            self.on_unresolved(job)
+        except Exception as e:
+            logger.error(f"on_unresolved hook failed for booking job {job['idempotency_key']}: {e}")
+
+    def _job_times(self, payload):
+        try:
+            start = self._to_datetime(payload["start_time"])
+            end = self._to_datetime(payload["end_time"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid booking times: {e}") from e
+        if end <= start:
+            raise ValueError(f"Booking ends before it starts: {payload['start_time']} - {payload['end_time']}")
+        return start, end
+
+    def _to_datetime(self, value):
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=self.time_zone)
+        return dt
+
+    def _event_time(self, value):
+        if value.get("dateTime"):
+            return self._to_datetime(value["dateTime"])
+        if value.get("date"):
+            # All-day events block the whole day.
+            return datetime.fromisoformat(value["date"]).replace(tzinfo=self.time_zone)
+        return None
@@ -1,8 +1,30 @@
 # google_calendar_manager.py
+import json
+
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.errors import HttpError
+
+# Calendar API batches are limited to 50 requests each.
+MAX_BATCH_SIZE = 50
+
+
+class CalendarRequestError(Exception):
+    def __init__(self, status, message, reason=None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+def error_reason(error):
+    """First ``reason`` from a Calendar API error body, e.g. "rateLimitExceeded"."""
+    try:
+        content = json.loads(error.content)
+        return content["error"]["errors"][0]["reason"]
+    except (ValueError, TypeError, KeyError, IndexError):
+        return None
 
 class GoogleCalendarScheduler:
     def __init__(self, credentials_path):
@@ -54,4 +76,50 @@ class GoogleCalendarScheduler:
                                                    timeMax=time_max, singleEvents=True,
                                                    orderBy='startTime').execute()
         events = events_result.get('items', [])
-        return len(events) == 0
\ No newline at end of file
+        return len(events) == 0
+
+    def list_events(self, time_min, time_max):
+        if not self.service:
+            self.authenticate()
+        events = []
+        page_token = None
+        while True:
+            events_result = self.service.events().list(calendarId='primary', timeMin=time_min,
+                                                       timeMax=time_max, singleEvents=True,
+                                                       pageToken=page_token).execute()
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events
+
+    def execute_batch(self, operations):
+        """Run ("insert" | "patch" | "delete", event_id, body) operations as batch requests.
+
+        Returns one (response, error) pair per operation, in order.
+        """
+        if not self.service:
+            self.authenticate()
+        # Anything the batch never answers must read as a (retryable) error, not success.
+        missing = CalendarRequestError(None, "No response for batched request")
+        results = [(None, missing)] * len(operations)
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if isinstance(exception, HttpError):
+                exception = CalendarRequestError(exception.resp.status, str(exception), error_reason(exception))
+            results[index] = (response, exception)
+
+        for offset in range(0, len(operations), MAX_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, (method, event_id, body) in enumerate(operations[offset:offset + MAX_BATCH_SIZE], offset):
+                if method == 'insert':
+                    request = self.service.events().insert(calendarId='primary', body=body)
+                elif method == 'patch':
+                    request = self.service.events().patch(calendarId='primary', eventId=event_id, body=body)
+                elif method == 'delete':
+                    request = self.service.events().delete(calendarId='primary', eventId=event_id)
+                else:
+                    raise ValueError(f"Unknown calendar operation: {method}")
+                batch.add(request, request_id=str(index))
+            batch.execute()
+        return results
\ No newline at end of file
@@ -16,6 +16,7 @@ class NERExtractor:
         self.logger.info("Initializing NERExtractor")
         self.nlp = spacy.load("en_core_web_sm")
         self.client_secret_path = "/Users/nileshhanotia/Desktop/MLC/voice_agent_1/client_secret.json"
+        self.calendar_service = None
 
     def extract_entities(self, text):
         try:
@@ -79,10 +80,8 @@ class NERExtractor:
     
     def create_google_calendar_event(self, event_details):
         try:
-            # Authenticate using client secret JSON file
-            credentials = self.get_credentials()
-            if not credentials:
-                self.logger.error("Failed to obtain credentials")
+            service = self.get_calendar_service()
+            if not service:
                 return False
 
             # Construct event data
@@ -93,9 +92,6 @@ class NERExtractor:
                 'end': {'dateTime': event_details['end_time']},  # Event end time
             }
 
-            # Create Google Calendar API service
-            service = build('calendar', 'v3', credentials=credentials)
-
             # Send POST request to Google Calendar API to create event
             response = service.events().insert(calendarId='primary', body=event_data).execute()
 
@@ -109,6 +105,16 @@ class NERExtractor:
             self.logger.error(f"Error creating event: {e}")
             return False
 
+    def get_calendar_service(self):
+        # Authenticate and build the API client once, not on every event.
+        if self.calendar_service is None:
+            credentials = self.get_credentials()
+            if not credentials:
+                self.logger.error("Failed to obtain credentials")
+                return None
+            self.calendar_service = build('calendar', 'v3', credentials=credentials)
+        return self.calendar_service
+
     def get_credentials(self):
         try:
             if os.path.exists(self.client_secret_path):
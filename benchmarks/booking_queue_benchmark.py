@@ -0,0 +1,70 @@
+"""Throughput of the write-behind booking queue against a local fake calendar.
+
+Compares one blocking insert per booking (the old NERExtractor path, minus the
+per-call auth) with the queue draining batches. Run from the repo root:
+
+    python -m benchmarks.booking_queue_benchmark --bookings 500 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from api.utils.booking_queue import BookingQueue
+from tests.fake_calendar import FakeCalendar
+
+
+def slots(count):
+    start = datetime(2030, 1, 1, 9, 0)
+    for i in range(count):
+        slot = start + timedelta(minutes=30 * i)
+        yield f"booking-{i}", slot.isoformat(), (slot + timedelta(minutes=30)).isoformat()
+
+
+def bench_direct(count, latency):
+    calendar = FakeCalendar(latency)
+    started = time.perf_counter()
+    for booking_id, start_time, end_time in slots(count):
+        calendar.insert({"summary": booking_id, "start": {"dateTime": start_time}, "end": {"dateTime": end_time}})
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed / count, calendar.requests
+
+
+async def bench_queue(count, latency, batch_size):
+    calendar = FakeCalendar(latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = BookingQueue(os.path.join(tmp, "bench.db"), calendar, "UTC", batch_size=batch_size)
+        started = time.perf_counter()
+        for booking_id, start_time, end_time in slots(count):
+            queue.enqueue_create(booking_id, start_time, end_time, summary=booking_id)
+        enqueue_elapsed = time.perf_counter() - started
+        while await queue.drain_once():
+            pass
+        elapsed = time.perf_counter() - started
+        assert queue.pending_count() == 0
+        assert len(calendar.events) == count
+        queue.close()
+    return elapsed, enqueue_elapsed / count, calendar.requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per simulated HTTP round trip")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = [
+        ("direct insert", *bench_direct(args.bookings, args.latency)),
+        (f"queue (batch {args.batch_size})", *asyncio.run(bench_queue(args.bookings, args.latency, args.batch_size))),
+    ]
+    print(f"{args.bookings} bookings, {args.latency * 1000:.0f} ms per round trip")
+    print(f"{'mode':<20}{'total s':>10}{'bookings/s':>12}{'caller ms':>12}{'requests':>10}")
+    for name, elapsed, caller, requests in rows:
+        print(f"{name:<20}{elapsed:>10.2f}{args.bookings / elapsed:>12.1f}{caller * 1000:>12.2f}{requests:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,12 @@ import json
 import os
 import logging
 import base64
+import secrets
+import uuid
+from datetime import datetime
 
 # FastAPI and Starlette imports
-from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi import FastAPI, WebSocket, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -18,6 +21,8 @@ from api.utils.text_to_speech import TextToSpeech
 from api.utils.transcript_collector import TranscriptCollector
 from api.utils.ner_extractor import NERExtractor
 from api.utils.calendar_manager import GoogleCalendarScheduler
+from api.utils.booking_queue import BookingQueue
+from api.utils.appointment_manager import AppointmentManager
 
 
 # Initialize logging
@@ -42,6 +47,23 @@ ner_extractor = NERExtractor()
 calendar_api = GoogleCalendarScheduler(os.getenv("GOOGLE_CALENDAR_CREDENTIALS"))
 transcript_collector = TranscriptCollector()
 
+def log_unresolved_booking(job):
+    # Patient details stay in the queue database; logs only carry the booking id.
+    logger.warning(f"Booking {job['booking_id']} needs follow-up ({job['action']} {job['status']})")
+
+# Spoken times have no offset; guessing a zone would book the wrong slot.
+calendar_time_zone = os.getenv("CALENDAR_TIME_ZONE")
+if not calendar_time_zone:
+    raise RuntimeError("CALENDAR_TIME_ZONE must be set to the clinic's time zone, e.g. America/Los_Angeles")
+
+booking_queue = BookingQueue(
+    os.getenv("BOOKING_QUEUE_DB", "booking_queue.db"),
+    calendar_api,
+    calendar_time_zone,
+    on_unresolved=log_unresolved_booking,
+)
+appointment_manager = AppointmentManager(booking_queue)
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
@@ -63,10 +85,28 @@ class ConversationState:
         self.state = "greeting"
         self.patient_info = {}
         self.is_booking_appointment = False
+        self.booking_id = None
+
+@app.on_event("startup")
+async def start_booking_queue():
+    booking_queue.start()
+
+@app.on_event("shutdown")
+async def stop_booking_queue():
+    await booking_queue.stop()
 
 @app.get("/")
 async def root():
     return FileResponse("static/index.html")
+
+@app.get("/bookings/attention")
+async def bookings_needing_attention(x_staff_token: str | None = Header(default=None)):
+    """Bookings the calendar could not take (conflicts, failures) for staff to call back."""
+    # Rows hold patient contact details and visit reasons, so only staff may read them.
+    staff_token = os.getenv("STAFF_API_TOKEN")
+    if not staff_token or not x_staff_token or not secrets.compare_digest(x_staff_token, staff_token):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return booking_queue.needs_attention()
     
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -136,6 +176,7 @@ async def process_conversation(transcription: str, state: ConversationState) ->
         # Check for appointment booking intent
         if not state.is_booking_appointment and check_appointment_intent(transcription):
             state.is_booking_appointment = True
+            state.booking_id = str(uuid.uuid4())
             state.state = "collecting_name"
             return "I'd be happy to help you book an appointment. Can I have your full name, please?"
         
@@ -176,9 +217,18 @@ async def handle_appointment_booking(text: str, state: ConversationState) -> str
     
     elif state.state == "checking_availability":
         try:
+            state.patient_info['preferred_time'] = text
+            # The calendar write happens in the background; confirm right away.
+            start_time = await appointment_manager.book_appointment(state.booking_id, state.patient_info, text)
             state.is_booking_appointment = False
             state.state = "listening"
-            return f"Great! I've noted your preferred time. We'll verify availability and contact you to confirm the appointment. Is there anything else I can help you with?"
+            if start_time:
+                start = datetime.fromisoformat(start_time)
+                when = start.strftime('%A, %B %d at %I:%M %p')
+                if start.year != datetime.now().year:
+                    when = start.strftime('%A, %B %d, %Y at %I:%M %p')
+                return f"Great! I've requested your appointment for {when}. If that time turns out to be unavailable, our staff will call you at {state.patient_info.get('contact', 'the number you gave')} to arrange another. Is there anything else I can help you with?"
+            return f"Thank you. I've passed your preferred time to our staff, who will call you at {state.patient_info.get('contact', 'the number you gave')} to confirm the appointment. Is there anything else I can help you with?"
         except Exception as e:
             logger.error(f"Appointment booking error: {e}")
             return "I apologize, but I'm having trouble scheduling the appointment. Could you please try again or call our office directly?"
@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class FakeCalendarError(Exception):
+    def __init__(self, status, message, reason=None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class FakeCalendar:
+    """In-memory calendar charging one simulated round trip per HTTP request."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.events = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        self.requests += 1
+        time.sleep(self.latency)
+
+    def insert(self, body):
+        self._round_trip()
+        return self._apply("insert", None, body)
+
+    def list_events(self, time_min, time_max):
+        self._round_trip()
+        with self._lock:
+            return [dict(event) for event in self.events.values()
+                    if event["start"]["dateTime"] < time_max and time_min < event["end"]["dateTime"]]
+
+    def execute_batch(self, operations):
+        results = []
+        for offset in range(0, len(operations), 50):
+            self._round_trip()
+            for method, event_id, body in operations[offset:offset + 50]:
+                try:
+                    results.append((self._apply(method, event_id, body), None))
+                except FakeCalendarError as e:
+                    results.append((None, e))
+        return results
+
+    def _apply(self, method, event_id, body):
+        with self._lock:
+            if method == "insert":
+                event_id = body.get("id") or str(len(self.events))
+                if event_id in self.events:
+                    raise FakeCalendarError(409, "duplicate")
+                self.events[event_id] = dict(body, id=event_id)
+                return self.events[event_id]
+            if event_id not in self.events:
+                raise FakeCalendarError(404, "not found")
+            if method == "delete":
+                del self.events[event_id]
+                return {}
+            self.events[event_id].update(body)
+            return self.events[event_id]
@@ -0,0 +1,38 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from api.utils.appointment_manager import AppointmentManager
+
+
+@pytest.fixture
+def manager():
+    return AppointmentManager(booking_queue=None)
+
+
+def spoken(day, time_of_day):
+    return f"{day:%B} {day.day} {time_of_day}"
+
+
+def test_earlier_time_today_stays_this_year(manager):
+    today = date.today()
+
+    start_time, _ = manager.parse_datetime(spoken(today, "12:01 AM"))
+
+    assert datetime.fromisoformat(start_time).date() == today
+
+
+def test_past_date_rolls_to_next_year(manager):
+    yesterday = date.today() - timedelta(days=1)
+    if (yesterday.month, yesterday.day) == (2, 29):
+        pytest.skip("February 29 does not exist in every year")
+
+    start_time, _ = manager.parse_datetime(spoken(yesterday, "10:00 AM"))
+
+    assert datetime.fromisoformat(start_time).date() == yesterday.replace(year=yesterday.year + 1)
+
+
+def test_explicit_year_is_kept(manager):
+    start_time, end_time = manager.parse_datetime("March 5, 2031 10:00 AM")
+
+    assert (start_time, end_time) == ("2031-03-05T10:00:00", "2031-03-05T11:00:00")
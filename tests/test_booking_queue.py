@@ -0,0 +1,256 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from api.utils.booking_queue import BookingQueue, event_id_for
+from tests.fake_calendar import FakeCalendar, FakeCalendarError
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "queue.db")
+
+
+@pytest.fixture
+def queue(db_path, calendar):
+    queue = BookingQueue(db_path, calendar, "UTC", base_retry_delay=0)
+    yield queue
+    queue.close()
+
+
+def write_database(db_path, sql, params=()):
+    # Stands in for rows left behind by an older release or a crashed process.
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(sql, params)
+    conn.close()
+
+
+def drain(queue):
+    async def run():
+        while await queue.drain_once():
+            pass
+    asyncio.run(run())
+
+
+def slot(day, hour=9):
+    return f"2030-01-{day:02d}T{hour:02d}:00:00", f"2030-01-{day:02d}T{hour + 1:02d}:00:00"
+
+
+def test_duplicate_enqueue_is_ignored(queue, calendar):
+    first = queue.enqueue_create("a", *slot(1), summary="A")
+    second = queue.enqueue_create("a", *slot(1), summary="A")
+
+    assert first == second
+    assert queue.pending_count() == 1
+    drain(queue)
+    assert list(calendar.events) == [event_id_for("a")]
+
+
+def test_replayed_create_conflicting_id_is_done(queue, calendar):
+    calendar.insert({"id": event_id_for("a"), "start": {"dateTime": "2030-01-01T09:00:00+00:00"},
+                     "end": {"dateTime": "2030-01-01T10:00:00+00:00"}})
+    key = queue.enqueue_create("a", *slot(1), summary="A")
+
+    drain(queue)
+
+    assert queue.status(key)["status"] == "done"
+    assert len(calendar.events) == 1
+
+
+def test_cancel_of_missing_event_is_done(queue):
+    key = queue.enqueue_cancel("never-created")
+
+    drain(queue)
+
+    assert queue.status(key)["status"] == "done"
+
+
+def test_cancel_waits_for_its_create(queue, calendar):
+    create = queue.enqueue_create("a", *slot(1), summary="A")
+    cancel = queue.enqueue_cancel("a")
+
+    async def first_batch():
+        return await queue.drain_once()
+
+    # The cancel cannot be claimed in the same batch as the create it follows.
+    assert asyncio.run(first_batch()) == 1
+    assert queue.status(create)["status"] == "done"
+    assert queue.status(cancel)["status"] == "pending"
+    drain(queue)
+    assert queue.status(cancel)["status"] == "done"
+    assert calendar.events == {}
+
+
+def test_conflict_within_batch(queue, calendar):
+    first = queue.enqueue_create("a", *slot(1), summary="A")
+    second = queue.enqueue_create("b", "2030-01-01T09:30:00", "2030-01-01T10:30:00", summary="B",
+                                  name="Bo", contact="555-0100")
+
+    drain(queue)
+
+    assert queue.status(first)["status"] == "done"
+    assert queue.status(second)["status"] == "conflict"
+    assert list(calendar.events) == [event_id_for("a")]
+    attention = queue.needs_attention()
+    assert [job["booking_id"] for job in attention] == ["b"]
+    assert attention[0]["payload"]["contact"] == "555-0100"
+
+
+def test_reschedule_back_to_earlier_time(queue, calendar):
+    queue.enqueue_create("a", *slot(1), summary="A")
+    drain(queue)
+    for day in (2, 3, 2):
+        queue.enqueue_reschedule("a", *slot(day))
+        drain(queue)
+
+    assert calendar.events[event_id_for("a")]["start"]["dateTime"].startswith("2030-01-02T09:00")
+
+
+def test_pending_reschedules_are_superseded(queue, calendar):
+    queue.enqueue_create("a", *slot(1), summary="A")
+    older = queue.enqueue_reschedule("a", *slot(2))
+    latest = queue.enqueue_reschedule("a", *slot(3))
+
+    drain(queue)
+
+    assert queue.status(older)["status"] == "superseded"
+    assert queue.status(latest)["status"] == "done"
+    assert calendar.events[event_id_for("a")]["start"]["dateTime"].startswith("2030-01-03T09:00")
+
+
+def test_malformed_job_fails_alone(queue, db_path, calendar):
+    with pytest.raises(ValueError):
+        queue.enqueue_create("bad", "not a date", "2030-01-01T10:00:00", summary="Bad")
+    write_database(
+        db_path,
+        "INSERT INTO booking_jobs (idempotency_key, booking_id, action, payload, status, "
+        "next_attempt_at, created_at, updated_at) VALUES ('bad:create', 'bad', 'create', ?, 'pending', 0, 0, 0)",
+        ('{"start_time": "not a date", "end_time": "x"}',),
+    )
+    good = queue.enqueue_create("b3", *slot(1), summary="B3")
+
+    drain(queue)
+
+    assert queue.status("bad:create")["status"] == "failed"
+    assert queue.status(good)["status"] == "done"
+
+
+def test_retry_backoff_then_failed(db_path, calendar):
+    unresolved = []
+    queue = BookingQueue(db_path, calendar, "UTC", max_attempts=3,
+                         base_retry_delay=0.05, on_unresolved=unresolved.append)
+
+    def unavailable(operations):
+        return [(None, FakeCalendarError(503, "unavailable"))] * len(operations)
+
+    calendar.execute_batch = unavailable
+    key = queue.enqueue_create("a", *slot(1), summary="A")
+
+    for attempt in (1, 2):
+        failed_at = time.time()
+        drain(queue)
+        status = queue.status(key)
+        assert (status["status"], status["attempts"]) == ("pending", attempt)
+        delay = 0.05 * 2 ** (attempt - 1)
+        assert status["next_attempt_at"] >= failed_at + delay
+        # Not due yet, so nothing is claimed until the backoff elapses.
+        assert asyncio.run(queue.drain_once()) == 0
+        time.sleep(status["next_attempt_at"] - time.time() + 0.01)
+
+    drain(queue)
+    assert queue.status(key)["status"] == "failed"
+    assert [job["idempotency_key"] for job in unresolved] == [key]
+    queue.close()
+
+
+def test_in_progress_jobs_recovered_on_startup(db_path, calendar):
+    queue = BookingQueue(db_path, calendar, "UTC")
+    key = queue.enqueue_create("a", *slot(1), summary="A")
+    queue.close()
+    # The worker claimed the job, then the process died mid-batch.
+    write_database(db_path, "UPDATE booking_jobs SET status = 'in_progress'")
+
+    restarted = BookingQueue(db_path, calendar, "UTC")
+    assert restarted.status(key)["status"] == "pending"
+    drain(restarted)
+    assert restarted.status(key)["status"] == "done"
+    restarted.close()
+
+
+def test_worker_survives_unexpected_error(queue, calendar):
+    execute_batch = calendar.execute_batch
+    calls = []
+
+    def malformed_once(operations):
+        calls.append(operations)
+        if len(calls) == 1:
+            return [None] * len(operations)
+        return execute_batch(operations)
+
+    calendar.execute_batch = malformed_once
+    queue.poll_interval = 0.01
+
+    async def run():
+        queue.start()
+        key = queue.enqueue_create("a", *slot(1), summary="A")
+        for _ in range(100):
+            if queue.status(key)["status"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return key
+
+    key = asyncio.run(run())
+    assert len(calls) == 2
+    assert queue.status(key)["status"] == "done"
+
+
+@pytest.mark.parametrize("reason, expected", [
+    ("rateLimitExceeded", "pending"),
+    ("userRateLimitExceeded", "pending"),
+    ("forbidden", "failed"),
+])
+def test_forbidden_retries_only_rate_limits(queue, calendar, reason, expected):
+    def forbidden(operations):
+        return [(None, FakeCalendarError(403, "forbidden", reason))] * len(operations)
+
+    calendar.execute_batch = forbidden
+    key = queue.enqueue_create("a", *slot(1), summary="A")
+
+    asyncio.run(queue.drain_once())
+
+    assert queue.status(key)["status"] == expected
+
+
+def test_unscheduled_booking_needs_attention(db_path, calendar):
+    unresolved = []
+    queue = BookingQueue(db_path, calendar, "UTC", on_unresolved=unresolved.append)
+
+    key = queue.record_unscheduled("a", "tomorrow at 10 am", summary="A", name="Al", contact="555-0100")
+    drain(queue)
+
+    assert queue.status(key)["status"] == "unscheduled"
+    assert calendar.events == {}
+    attention = queue.needs_attention()
+    assert attention[0]["payload"]["requested_time"] == "tomorrow at 10 am"
+    assert attention[0]["payload"]["contact"] == "555-0100"
+    assert [job["booking_id"] for job in unresolved] == ["a"]
+    queue.close()
+
+
+def test_naive_times_use_clinic_time_zone(db_path, calendar):
+    queue = BookingQueue(db_path, calendar, "America/Los_Angeles")
+
+    queue.enqueue_create("a", *slot(1), summary="A")
+    drain(queue)
+
+    assert calendar.events[event_id_for("a")]["start"]["dateTime"] == "2030-01-01T09:00:00-08:00"
+    queue.close()
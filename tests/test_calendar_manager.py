@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from api.utils.calendar_manager import CalendarRequestError, GoogleCalendarScheduler
+
+
+class StubEvents:
+    def insert(self, calendarId, body):
+        return ("insert", None, body)
+
+    def patch(self, calendarId, eventId, body):
+        return ("patch", eventId, body)
+
+    def delete(self, calendarId, eventId):
+        return ("delete", eventId, None)
+
+
+class StubBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        self.service.batch_sizes.append(len(self.requests))
+        for request, request_id in self.requests:
+            outcome = self.service.respond(request)
+            if outcome is None:
+                continue
+            response, exception = outcome
+            self.callback(request_id, response, exception)
+
+
+class StubService:
+    def __init__(self, respond):
+        self.respond = respond
+        self.batch_sizes = []
+
+    def events(self):
+        return StubEvents()
+
+    def new_batch_http_request(self, callback):
+        return StubBatch(self, callback)
+
+
+def scheduler_with(respond):
+    scheduler = GoogleCalendarScheduler("unused-client-secret.json")
+    scheduler.service = StubService(respond)
+    return scheduler
+
+
+def http_error(status, reason):
+    content = json.dumps({"error": {"code": status, "errors": [{"reason": reason}]}}).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+def test_execute_batch_chunks_and_keeps_order():
+    scheduler = scheduler_with(lambda request: ({"id": request[2]["id"]}, None))
+    operations = [("insert", None, {"id": f"event{i}"}) for i in range(120)]
+
+    results = scheduler.execute_batch(operations)
+
+    assert scheduler.service.batch_sizes == [50, 50, 20]
+    assert [response["id"] for response, _ in results] == [f"event{i}" for i in range(120)]
+    assert all(error is None for _, error in results)
+
+
+def test_execute_batch_maps_http_errors():
+    def respond(request):
+        method, event_id, _ = request
+        if method == "delete":
+            return None, http_error(404, "notFound")
+        return None, http_error(403, "rateLimitExceeded")
+
+    scheduler = scheduler_with(respond)
+    results = scheduler.execute_batch([("patch", "a", {}), ("delete", "b", None)])
+
+    (_, rate_limited), (_, missing) = results
+    assert isinstance(rate_limited, CalendarRequestError)
+    assert (rate_limited.status, rate_limited.reason) == (403, "rateLimitExceeded")
+    assert (missing.status, missing.reason) == (404, "notFound")
+
+
+def test_execute_batch_unanswered_request_is_an_error():
+    # The second request never reaches the callback.
+    scheduler = scheduler_with(lambda request: ({}, None) if request[1] == "a" else None)
+
+    results = scheduler.execute_batch([("delete", "a", None), ("delete", "b", None)])
+
+    assert results[0] == ({}, None)
+    assert results[1][0] is None
+    assert isinstance(results[1][1], CalendarRequestError)
+
+
+def test_execute_batch_rejects_unknown_operation():
+    scheduler = scheduler_with(lambda request: ({}, None))
+
+    with pytest.raises(ValueError):
+        scheduler.execute_batch([("move", "a", None)])
@@ -0,0 +1,75 @@
+import asyncio
+import importlib
+
+import pytest
+
+# main builds every service at import time, so it needs the full environment.
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_groq")
+pytest.importorskip("spacy")
+pytest.importorskip("en_core_web_sm")
+
+from api.utils.appointment_manager import AppointmentManager
+from api.utils.booking_queue import BookingQueue, event_id_for
+from tests.fake_calendar import FakeCalendar
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    monkeypatch.setenv("CALENDAR_TIME_ZONE", "America/Los_Angeles")
+    monkeypatch.setenv("BOOKING_QUEUE_DB", str(tmp_path / "import.db"))
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    return importlib.import_module("main")
+
+
+@pytest.fixture
+def calendar():
+    return FakeCalendar()
+
+
+@pytest.fixture
+def queue(app_module, tmp_path, calendar, monkeypatch):
+    queue = BookingQueue(str(tmp_path / "queue.db"), calendar, "America/Los_Angeles")
+    monkeypatch.setattr(app_module, "appointment_manager", AppointmentManager(queue))
+    yield queue
+    queue.close()
+
+
+def converse(app_module, *messages):
+    async def run():
+        state = app_module.ConversationState()
+        replies = [await app_module.process_conversation(message, state) for message in messages]
+        return state, replies
+    return asyncio.run(run())
+
+
+def booking_call(preferred_time):
+    return ("Hello", "I'd like to book an appointment", "Jane Doe", "555-0100", "Annual check-up", preferred_time)
+
+
+def test_booking_is_queued_and_written_to_calendar(app_module, queue, calendar):
+    state, replies = converse(app_module, *booking_call("March 5, 2031 10:00 AM"))
+
+    assert "requested your appointment for Wednesday, March 05, 2031 at 10:00 AM" in replies[-1]
+    assert state.state == "listening"
+    assert queue.status(f"{state.booking_id}:create")["status"] == "pending"
+
+    async def drain():
+        while await queue.drain_once():
+            pass
+    asyncio.run(drain())
+
+    event = calendar.events[event_id_for(state.booking_id)]
+    assert event["start"]["dateTime"] == "2031-03-05T10:00:00-08:00"
+    assert event["summary"] == "Appointment with Jane Doe"
+
+
+def test_unparsed_time_is_kept_for_staff(app_module, queue):
+    state, replies = converse(app_module, *booking_call("tomorrow at 10 am"))
+
+    assert "our staff, who will call you at 555-0100" in replies[-1]
+    attention = queue.needs_attention()
+    assert [job["booking_id"] for job in attention] == [state.booking_id]
+    assert attention[0]["status"] == "unscheduled"
+    assert attention[0]["payload"]["requested_time"] == "tomorrow at 10 am"
+    assert attention[0]["payload"]["contact"] == "555-0100"